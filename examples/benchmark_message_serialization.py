@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+import msgpack
+import zmq
+
+import pupil_labs.pupil_core_network_client as pcnc
+
+WIDTH, HEIGHT = 600, 400
+TOPIC = "hmd_streaming.custom"
+STATIC_FIELDS = {
+    "format": "bgr",
+    "projection_matrix": [  # dummy pin-hole camera intrinsics
+        [1000, 0.0, WIDTH / 2.0],
+        [0.0, 1000, HEIGHT / 2.0],
+        [0.0, 0.0, 1.0],
+    ],
+    "topic": TOPIC,
+    "width": WIDTH,
+    "height": HEIGHT,
+}
+IMAGE = bytes(WIDTH * HEIGHT * 3)
+
+
+def main(num_messages: int, address: str | None, port: int):
+    """Measures messages/s of the HMD streaming pattern
+
+    Without ``address``, messages are sent to a local PUB socket without
+    subscribers, i.e. the result reflects the client-side overhead only.
+    """
+    if address is None:
+        socket = zmq.Context.instance().socket(zmq.PUB)
+        socket.bind_to_random_port("tcp://127.0.0.1")
+        report("msgpack.packb per message", num_messages, packb_per_message, socket)
+        report("MessageTemplate", num_messages, prepared_template, socket)
+        socket.close()
+    else:
+        device = pcnc.Device(address, port)
+        with device.high_frequency_message_sending():
+            report("Device.send_message", num_messages, device_send_message, device)
+            report(
+                "Device.send_prepared_message",
+                num_messages,
+                device_send_prepared_message,
+                device,
+            )
+
+
+def report(name: str, num_messages: int, benchmark, target):
+    duration = benchmark(target, num_messages)
+    print(f"{name:<32} {num_messages / duration:>12,.0f} messages/s")
+
+
+def packb_per_message(socket: zmq.Socket, num_messages: int) -> float:
+    start = time.perf_counter()
+    for index in range(num_messages):
+        payload = {**STATIC_FIELDS, "index": index, "timestamp": time.monotonic()}
+        serialized = msgpack.packb(payload, use_bin_type=True)
+        socket.send_string(TOPIC, flags=zmq.SNDMORE)
+        socket.send(serialized, flags=zmq.SNDMORE)
+        socket.send(IMAGE, copy=True)
+    return time.perf_counter() - start
+
+
+def prepared_template(socket: zmq.Socket, num_messages: int) -> float:
+    start = time.perf_counter()
+    template = pcnc.MessageTemplate(STATIC_FIELDS)
+    for index in range(num_messages):
+        serialized = template.serialize(index=index, timestamp=time.monotonic())
+        socket.send(template.topic_bytes, flags=zmq.SNDMORE)
+        socket.send(serialized, flags=zmq.SNDMORE)
+        socket.send(IMAGE, copy=True)
+    return time.perf_counter() - start
+
+
+def device_send_message(device: pcnc.Device, num_messages: int) -> float:
+    start = time.perf_counter()
+    for index in range(num_messages):
+        device.send_message(
+            {
+                **STATIC_FIELDS,
+                "index": index,
+                "timestamp": device.current_pupil_time(),
+                "__raw_data__": [IMAGE],
+            }
+        )
+    return time.perf_counter() - start
+
+
+def device_send_prepared_message(device: pcnc.Device, num_messages: int) -> float:
+    start = time.perf_counter()
+    template = device.prepare_message(STATIC_FIELDS)
+    for index in range(num_messages):
+        device.send_prepared_message(
+            template,
+            raw_data=[IMAGE],
+            index=index,
+            timestamp=device.current_pupil_time(),
+        )
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-a",
+        "--address",
+        type=str,
+        default=None,
+        help="Pupil Remote address; benchmarks offline if omitted",
+    )
+    parser.add_argument("-p", "--port", type=int, default=50020)
+    parser.add_argument("-n", "--num-messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    main(args.num_messages, args.address, args.port)
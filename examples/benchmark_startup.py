@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+IMPORT_PACKAGE = "import pupil_labs.pupil_core_network_client as pcnc"
+
+
+def main(num_runs: int, address: str | None, port: int):
+    """Measures import and startup times in fresh interpreter processes
+
+    Without ``address``, only the import times are measured since connecting requires
+    a running Pupil Capture or Pupil Service instance.
+    """
+    scenarios = {
+        "python": "pass",
+        "import package": IMPORT_PACKAGE,
+        "import Device": f"{IMPORT_PACKAGE}; pcnc.Device",
+    }
+    if address is not None:
+        cache_path = Path(tempfile.mkdtemp()) / "discovery.json"
+        device = f"pcnc.Device({address!r}, {port}"
+        first_use = "device.current_pupil_time(); device.ipc_pub_port"
+        cache = f"pcnc.DiscoveryCache(ttl=60.0, path={str(cache_path)!r})"
+        scenarios.update(
+            {
+                "Device(...)": f"{IMPORT_PACKAGE}; device = {device}); {first_use}",
+                "Device(..., lazy_connect=True)": (
+                    f"{IMPORT_PACKAGE}; device = {device}, lazy_connect=True); "
+                    f"{first_use}"
+                ),
+                "Device(..., discovery_cache=...)": (
+                    f"{IMPORT_PACKAGE}; device = {device}, discovery_cache={cache}); "
+                    f"{first_use}"
+                ),
+            }
+        )
+
+    for name, code in scenarios.items():
+        durations = [measure(code) for _ in range(num_runs)]
+        print(
+            f"{name:<34} median {statistics.median(durations) * 1000:8.1f} ms, "
+            f"min {min(durations) * 1000:8.1f} ms"
+        )
+
+
+def measure(code: str) -> float:
+    """Returns the duration of running ``code`` in a new process, in seconds"""
+    timed_code = (
+        "import time; _start = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - _start)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", timed_code], check=True, capture_output=True, text=True
+    ).stdout
+    return float(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-a",
+        "--address",
+        type=str,
+        default=None,
+        help="Pupil Remote address; only measures import times if omitted",
+    )
+    parser.add_argument("-p", "--port", type=int, default=50020)
+    parser.add_argument("-n", "--num-runs", type=int, default=10)
+    args = parser.parse_args()
+
+    main(args.num_runs, args.address, args.port)
@@ -25,22 +25,23 @@ def main(address: str, port: int, frame_rate_hz: int):
         # Pupil Remote forward every message one by one and waiting for a response each
         # time. This allows sending messages with a much higher rate.
         with device.high_frequency_message_sending():
+            # Serialize the fields that are the same for every frame only once
+            template = prepare_image_template(device, current_image, frame_topic)
             increasing_index = 0
             while True:
-                send_image(
-                    device,
-                    gray_image(increasing_index),
-                    frame_topic,
-                    increasing_index,
+                device.send_prepared_message(
+                    template,
+                    raw_data=[gray_image(increasing_index)],
+                    index=increasing_index,
                     timestamp=device.current_pupil_time(),
                 )
                 increasing_index += 1
                 time.sleep(1 / frame_rate_hz)
 
 
-def send_image(device: pcnc.Device, image, topic: str, index: int, timestamp: float):
+def prepare_image_template(device: pcnc.Device, image, topic: str):
     height, width, depth = image.shape
-    device.send_message(
+    return device.prepare_message(
         {
             "format": "bgr",
             "projection_matrix": [  # dummy pin-hole camera intrinsics
@@ -51,9 +52,6 @@ def send_image(device: pcnc.Device, image, topic: str, index: int, timestamp: fl
             "topic": topic,
             "width": width,
             "height": height,
-            "index": index,
-            "timestamp": timestamp,
-            "__raw_data__": [image],
         }
     )
 
@@ -0,0 +1,58 @@
+import argparse
+import contextlib
+
+import numpy as np
+
+import pupil_labs.pupil_core_network_client as pcnc
+
+
+def main(address: str, port: int, duration: float):
+    device = pcnc.Device(address, port)
+
+    source_class_name = "HMD_Streaming_Source"
+    world_topic = "hmd_streaming.world"
+    device.request_plugin_start(source_class_name, args={"topics": (world_topic,)})
+    for eye_id in range(2):
+        eye_topic = f"hmd_streaming.eye{eye_id}"
+        device.request_plugin_start_eye_process(
+            eye_id, source_class_name, args={"topics": (eye_topic,)}
+        )
+
+    # All feeds share one scheduler that paces frames against Pupil time and skips or
+    # downscales frames if Pupil Capture does not keep up
+    streamer = pcnc.VideoStreamer(device)
+    streamer.add_feed(world_topic, gray_images((720, 1280, 3)), frame_rate_hz=30)
+    streamer.add_feed("hmd_streaming.eye0", gray_images((192, 192, 3)), 120)
+    streamer.add_feed("hmd_streaming.eye1", gray_images((192, 192, 3)), 120)
+
+    with contextlib.suppress(KeyboardInterrupt):
+        streamer.run(duration=duration)
+    for stats in streamer.statistics.values():
+        print(
+            f"{stats.topic}: {stats.fps:.1f} fps, jitter {stats.jitter * 1000:.2f} ms, "
+            f"sent {stats.num_sent}, skipped {stats.num_skipped}, "
+            f"backpressured {stats.num_backpressured}, "
+            f"downscaled {stats.num_downscaled}"
+        )
+
+
+def gray_images(shape):
+    """Returns a function that creates images with a gray value between 85 and 170"""
+    index = 0
+
+    def next_image():
+        nonlocal index
+        index += 1
+        return np.full(shape, (index % 85) + 85, dtype=np.uint8)
+
+    return next_image
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-a", "--address", type=str, default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=50020)
+    parser.add_argument("-d", "--duration", type=float, default=None)
+    args = parser.parse_args()
+
+    main(args.address, args.port, args.duration)
@@ -37,6 +37,13 @@ def main(address: str, port: int):
         ),
     )
 
+    # Timestamps are captured immediately but the annotations are sent by a background
+    # thread. The calls never block, e.g. a stimulus presentation loop.
+    with device.send_annotations_in_background() as annotations:
+        for trial in range(3):
+            annotations.send_annotation(label="background", trial=trial)
+    print("Sent annotations in background", annotations.statistics)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -1,27 +1,97 @@
-"""Top-level entry-point for the <project_name> package"""
+"""Top-level entry-point for the <project_name> package
 
-try:
-    from importlib.metadata import PackageNotFoundError, version
-except ImportError:
-    from importlib_metadata import PackageNotFoundError, version
+Attributes are imported lazily on first access. Importing the package does not load
+zmq, msgpack, or the package metadata until they are needed.
+"""
 
-try:
-    __version__ = version("pupil-core-network-client")
-except PackageNotFoundError:
-    # package is not installed
-    __version__ = None
+import functools
+import importlib
+from typing import TYPE_CHECKING
 
-from .decorators import NotConnectedError
-from .device import ClockFunction, ClockOffsetStatistics, Device
-from .subscription import BackgroundSubscription, Message, Subscription
+if TYPE_CHECKING:
+    from .annotations import AnnotationQueue, AnnotationQueueStatistics
+    from .decorators import NotConnectedError
+    from .device import ClockFunction, ClockOffsetStatistics, Device
+    from .discovery_cache import DiscoveryCache, DiscoveryResult
+    from .message_template import MessageTemplate
+    from .streaming import StreamStatistics, VideoFeed, VideoStreamer
+    from .subscription import BackgroundSubscription, Message, Subscription
+    from .synchronization import (
+        SynchronizedMessages,
+        SynchronizedSubscription,
+        TimestampSynchronizer,
+    )
 
 __all__ = [
     "__version__",
+    "AnnotationQueue",
+    "AnnotationQueueStatistics",
     "ClockFunction",
     "ClockOffsetStatistics",
     "Device",
+    "DiscoveryCache",
+    "DiscoveryResult",
     "Message",
+    "MessageTemplate",
     "NotConnectedError",
+    "StreamStatistics",
     "Subscription",
     "BackgroundSubscription",
+    "SynchronizedMessages",
+    "SynchronizedSubscription",
+    "TimestampSynchronizer",
+    "VideoFeed",
+    "VideoStreamer",
 ]
+
+_ATTRIBUTE_MODULES = {
+    "AnnotationQueue": ".annotations",
+    "AnnotationQueueStatistics": ".annotations",
+    "NotConnectedError": ".decorators",
+    "ClockFunction": ".device",
+    "ClockOffsetStatistics": ".device",
+    "Device": ".device",
+    "DiscoveryCache": ".discovery_cache",
+    "DiscoveryResult": ".discovery_cache",
+    "MessageTemplate": ".message_template",
+    "StreamStatistics": ".streaming",
+    "VideoFeed": ".streaming",
+    "VideoStreamer": ".streaming",
+    "BackgroundSubscription": ".subscription",
+    "Message": ".subscription",
+    "Subscription": ".subscription",
+    "SynchronizedMessages": ".synchronization",
+    "SynchronizedSubscription": ".synchronization",
+    "TimestampSynchronizer": ".synchronization",
+}
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        value = _package_version()
+    elif name in _ATTRIBUTE_MODULES:
+        module = importlib.import_module(_ATTRIBUTE_MODULES[name], __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cache the value such that __getattr__ is only called once per attribute
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+@functools.lru_cache(maxsize=None)
+def _package_version():
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:
+        from importlib_metadata import PackageNotFoundError, version
+
+    try:
+        return version("pupil-core-network-client")
+    except PackageNotFoundError:
+        # package is not installed
+        return None
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+import msgpack
+import zmq
+
+if TYPE_CHECKING:
+    from .device import Device
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotationQueueStatistics(NamedTuple):
+    num_enqueued: int
+    "Number of accepted annotations"
+    num_sent: int
+    "Number of annotations handed to the socket"
+    num_dropped: int
+    "Number of annotations rejected because the queue was full"
+    num_failed: int
+    "Number of annotations that could not be serialized or sent"
+    mean_latency: float
+    "Mean time between enqueueing and sending, in seconds"
+    max_latency: float
+    "Maximum time between enqueueing and sending, in seconds"
+
+
+class _QueuedAnnotation(NamedTuple):
+    payload: dict
+    enqueue_time: float
+
+
+_STOP = None
+
+
+class AnnotationQueue:
+    """Sends annotations from a background thread without blocking the caller
+
+    :py:meth:`send_annotation` captures the timestamp at call time from the device's
+    client clock and estimated clock offset, and returns immediately. A background
+    thread sends queued annotations in batches directly to the IPC
+    backbone, similar to :py:meth:`Device.high_frequency_message_sending`.
+
+    At most ``max_size`` annotations are queued. Further annotations are dropped and
+    counted in :py:attr:`statistics`. Remaining annotations are sent on
+    :py:meth:`close`, when leaving the context manager, or at interpreter exit.
+
+    Use :py:meth:`Device.send_annotations_in_background` as entry point.
+
+    Example:
+
+    .. code-block:: python
+
+        device = Device()
+        with device.send_annotations_in_background() as annotations:
+            annotations.send_annotation("stimulus onset", trial=1)
+    """
+
+    def __init__(
+        self,
+        device: Device,
+        *,
+        max_size: int = 10000,
+        batch_size: int = 100,
+        connect_timeout: float = 1.0,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("`batch_size` needs to be at least 1")
+        self.device = device
+        self.batch_size = batch_size
+        "Maximum number of annotations sent per batch"
+        self.connect_timeout = connect_timeout
+        "Maximum time to wait for the connection before sending, in seconds"
+        self._url = f"tcp://{device.address}:{device.ipc_pub_port}"
+        self._queue: queue.Queue[_QueuedAnnotation | None] = queue.Queue(
+            maxsize=max_size
+        )
+        self._counter_lock = threading.Lock()
+        self._sent_condition = threading.Condition()
+        self._num_enqueued = 0
+        self._num_dropped = 0
+        self._num_sent = 0
+        self._num_failed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._is_running_flag = threading.Event()
+        self._is_started_flag = threading.Event()
+        self._is_worker_finished = False
+        self._worker_error: BaseException | None = None
+        self._worker_thread = threading.Thread(target=self._send_queued, daemon=True)
+        self._worker_thread.start()
+        self._is_started_flag.wait()
+        if self._worker_error is not None:
+            self._worker_thread.join()
+            raise self._worker_error
+        atexit.register(self.close)
+
+    @property
+    def is_running(self) -> bool:
+        return self._is_running_flag.is_set()
+
+    def send_annotation(
+        self, label: str, timestamp: float | None = None, **kwargs
+    ) -> bool:
+        """Queues an annotation without blocking
+
+        Returns ``False`` if the annotation was dropped because the queue is full or
+        closed.
+        """
+        enqueue_time = self.device.client_clock()
+        if timestamp is None:
+            # Device.current_pupil_time() might use the device's sockets, which are
+            # not thread-safe, or even reconnect, i.e. block
+            clock_offset = self.device.clock_offset_statistics.mean_offset
+            timestamp = enqueue_time + clock_offset
+        payload = {
+            "topic": "annotation",
+            "label": label,
+            "timestamp": timestamp,
+            **kwargs,
+        }
+        with self._counter_lock:
+            if not self.is_running:
+                self._num_dropped += 1
+                return False
+            try:
+                self._queue.put_nowait(_QueuedAnnotation(payload, enqueue_time))
+            except queue.Full:
+                self._num_dropped += 1
+                return False
+            self._num_enqueued += 1
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until all previously queued annotations were processed
+
+        Returns ``False`` if ``timeout`` seconds passed before or if the background
+        thread stopped.
+        """
+        target = self._num_enqueued
+
+        def is_processed():
+            return self._num_sent + self._num_failed >= target
+
+        with self._sent_condition:
+            self._sent_condition.wait_for(
+                lambda: is_processed() or self._is_worker_finished, timeout=timeout
+            )
+            return is_processed()
+
+    def close(self, timeout: float | None = None):
+        """Sends all queued annotations and stops the background thread
+
+        Waits at most ``timeout`` seconds for the queued annotations to be sent.
+        """
+        with self._counter_lock:
+            was_running = self.is_running
+            self._is_running_flag.clear()
+        atexit.unregister(self.close)
+        if not was_running or not self._worker_thread.is_alive():
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            # Blocks if the queue is full, until the worker made room for the marker
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Annotation queue did not finish sending in time")
+            return
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        self._worker_thread.join(timeout=remaining)
+        if self._worker_thread.is_alive():
+            logger.warning("Annotation queue did not finish sending in time")
+
+    @property
+    def statistics(self) -> AnnotationQueueStatistics:
+        with self._sent_condition:
+            mean_latency = (
+                self._total_latency / self._num_sent if self._num_sent else 0.0
+            )
+            return AnnotationQueueStatistics(
+                self._num_enqueued,
+                self._num_sent,
+                self._num_dropped,
+                self._num_failed,
+                mean_latency,
+                self._max_latency,
+            )
+
+    def _send_queued(self):
+        socket = zmq.Context.instance().socket(zmq.XPUB)
+        try:
+            try:
+                self._connect(socket)
+            except BaseException as err:
+                self._worker_error = err
+                return
+            finally:
+                self._is_started_flag.set()
+            self._is_running_flag.set()
+            packer = msgpack.Packer(use_bin_type=True)
+            is_stopping = False
+            while not is_stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is _STOP:
+                    batch.pop()
+                    is_stopping = True
+                self._send_batch(socket, packer, batch)
+        except BaseException:
+            logger.exception("Annotation queue stopped unexpectedly")
+            raise
+        finally:
+            with self._counter_lock:
+                self._is_running_flag.clear()
+            with self._sent_condition:
+                self._is_worker_finished = True
+                self._sent_condition.notify_all()
+            socket.close(linger=int(self.connect_timeout * 1000))
+
+    def _connect(self, socket: zmq.Socket):
+        # PUB sockets drop messages until the peer's subscriptions arrived. XPUB sockets
+        # receive these subscriptions, i.e. wait for the first one to avoid losing the
+        # first annotations.
+        socket.connect(self._url)
+        if socket.poll(int(self.connect_timeout * 1000)):
+            socket.recv()
+        else:
+            logger.warning(f"No subscription received from {self._url}")
+
+    def _send_batch(self, socket: zmq.Socket, packer: msgpack.Packer, batch: list):
+        num_sent = num_failed = 0
+        total_latency = max_latency = 0.0
+        for annotation in batch:
+            try:
+                # Serialize first to avoid sending a dangling topic frame
+                serialized_payload = packer.pack(annotation.payload)
+                socket.send(b"annotation", flags=zmq.SNDMORE)
+                socket.send(serialized_payload)
+            except Exception:
+                logger.exception(f"Failed to send annotation {annotation.payload}")
+                num_failed += 1
+                continue
+            latency = self.device.client_clock() - annotation.enqueue_time
+            total_latency += latency
+            max_latency = max(max_latency, latency)
+            num_sent += 1
+
+        with self._sent_condition:
+            self._num_sent += num_sent
+            self._num_failed += num_failed
+            self._total_latency += total_latency
+            self._max_latency = max(self._max_latency, max_latency)
+            self._sent_condition.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
@@ -9,6 +9,8 @@ def ensure_connected(fn):
     @functools.wraps(fn)
     def wrapper(*args, **kwargs):
         # requires isinstance(args[0], Device)
+        if getattr(args[0], "is_connection_pending", False):
+            args[0].connect()
         if not args[0].is_connected:
             raise NotConnectedError
         return fn(*args, **kwargs)
@@ -3,6 +3,7 @@ from __future__ import annotations
 import contextlib
 import logging
 import statistics
+import threading
 import time
 from typing import Callable, NamedTuple, Sequence, TypeVar
 
@@ -13,11 +14,14 @@ except ImportError:
 
 import msgpack
 import zmq
-from zmq.utils.monitor import recv_monitor_message
 
-from . import __version__
-from .decorators import ensure_connected
+from . import _package_version
+from .annotations import AnnotationQueue
+from .decorators import NotConnectedError, ensure_connected
+from .discovery_cache import DiscoveryCache, DiscoveryResult
+from .message_template import MessageTemplate
 from .subscription import BackgroundSubscription, Subscription
+from .synchronization import SynchronizedSubscription, TimestampSynchronizer
 
 ClockFunction = Callable[[], float]
 T = TypeVar('T')
@@ -33,26 +37,50 @@ class Device:
         port: int = 50020,
         client_clock: ClockFunction = time.monotonic,
         should_auto_reconnect: bool = False,
+        lazy_connect: bool = False,
+        discovery_cache: DiscoveryCache | None = None,
     ) -> None:
+        """Connects to Pupil Remote at ``address:port``
+
+        With ``lazy_connect``, connecting is deferred until the first method call that
+        requires a connection. Pass a ``discovery_cache`` to reuse the IPC backend
+        ports and the clock offset estimation of previous connections, e.g. across
+        processes. Clock offsets are only reused for the system-wide clocks
+        ``time.monotonic`` and ``time.time``.
+        """
         self.client_clock: ClockFunction = client_clock
         "Client clock function. Returns time in seconds."
         self.address = address
         self.port = port
         self.clock_offset_statistics: ClockOffsetStatistics = None
         "Statistic results of the clock offset estimation"
+        self.ipc_pub_port: int | None = None
+        "Port of the IPC backend's PUB socket. Set on connect."
+        self.ipc_sub_port: int | None = None
+        "Port of the IPC backend's SUB socket. Set on connect."
         self._req_socket: zmq.Socket | None = None
         self._pub_socket: zmq.Socket | None = None
+        self._pub_send_high_water_mark: int | None = None
+        self._packer = msgpack.Packer(use_bin_type=True)
 
         self._should_auto_reconnect = should_auto_reconnect
         self._req_monitor: zmq.Socket | None = None
         self._previously_disconnected = False
         self._currently_reconnecting = False
-        self.connect()
+        self.discovery_cache = discovery_cache
+        "Cache for IPC backend ports and clock offsets, if any"
+        self.is_connection_pending = lazy_connect
+        "Whether the connection is deferred until its first use"
+        if not lazy_connect:
+            self.connect()
 
     @property
     def is_connected(self):
         if self._req_monitor and not self._currently_reconnecting:
             should_reconnect = False
+            # Imported on demand since it is slow to import and only needed here
+            from zmq.utils.monitor import recv_monitor_message
+
             while self._req_monitor.get(zmq.EVENTS) & zmq.POLLIN:
                 status = recv_monitor_message(self._req_monitor)
                 if status["event"] == zmq.EVENT_CONNECTED:
@@ -63,7 +91,10 @@ class Device:
             if should_reconnect and self._previously_disconnected:
                 logger.debug("Reconnecting...")
                 self._currently_reconnecting = True
-                self.connect()
+                # Pupil Capture might have been restarted with new IPC backend ports
+                if self.discovery_cache:
+                    self.discovery_cache.invalidate(self.address, self.port)
+                self.connect(use_discovery_cache=False)
                 if self._pub_socket:
                     self._teardown_pub_socket()
                     self._setup_pub_socket()
@@ -73,17 +104,73 @@ class Device:
 
         return self._req_socket is not None
 
-    def connect(self):
+    def connect(self, use_discovery_cache: bool = True):
+        """Connects to Pupil Remote, discovers the IPC backend ports, and estimates
+        the clock offset
+
+        Port discovery and clock offset estimation run concurrently. Cached results
+        are used if :py:attr:`discovery_cache` is set and ``use_discovery_cache`` is
+        true.
+        """
         if self.is_connected:
             self.disconnect()
+        self.is_connection_pending = False
 
         self._req_socket: zmq.Socket = zmq.Context.instance().socket(zmq.REQ)
         if self._should_auto_reconnect:
             self._req_monitor = self._req_socket.get_monitor_socket()
         self._req_socket.connect(f"tcp://{self.address}:{self.port}")
-        self._announce(f"connected.v{__version__}")
-        self._update_ipc_backend_ports()
-        self.estimate_client_to_remote_clock_offset()
+        self._announce(f"connected.v{_package_version()}")
+
+        cached = None
+        if use_discovery_cache and self.discovery_cache:
+            cached = self.discovery_cache.load(self.address, self.port)
+        if cached is not None:
+            logger.debug(f"Using cached discovery result {cached}")
+            self.ipc_pub_port = cached.ipc_pub_port
+            self.ipc_sub_port = cached.ipc_sub_port
+            clock_offset_statistics = self._reusable_clock_offset(cached)
+            if clock_offset_statistics is not None:
+                self.clock_offset_statistics = clock_offset_statistics
+            else:
+                self.estimate_client_to_remote_clock_offset()
+            return
+
+        # Pupil Remote replies to each REQ socket in lockstep. A second socket allows
+        # requesting the ports while the clock offset is being estimated.
+        ports: list[tuple[int, int]] = []
+        errors: list[Exception] = []
+
+        def request_ports():
+            try:
+                ports.append(self._request_ipc_backend_ports())
+            except Exception as err:
+                errors.append(err)
+
+        port_discovery = threading.Thread(target=request_ports)
+        port_discovery.start()
+        try:
+            self.estimate_client_to_remote_clock_offset()
+        finally:
+            port_discovery.join()
+        if errors:
+            raise ConnectionError(
+                "Failed to request the IPC backend ports"
+            ) from errors[0]
+        self.ipc_pub_port, self.ipc_sub_port = ports[0]
+
+        if self.discovery_cache:
+            self.discovery_cache.store(
+                self.address,
+                self.port,
+                DiscoveryResult(
+                    self.ipc_pub_port,
+                    self.ipc_sub_port,
+                    self.clock_offset_statistics,
+                    _clock_name(self.client_clock),
+                    time.time(),
+                ),
+            )
 
     def disconnect(self):
         if self._req_socket:
@@ -94,7 +181,7 @@ class Device:
 
     @contextlib.contextmanager
     @ensure_connected
-    def high_frequency_message_sending(self):
+    def high_frequency_message_sending(self, send_high_water_mark: int | None = None):
         """Context manager that improves the efficiency of :py:meth:`.send_message`
 
         Instead of sending the message to Pupil Remote via the REQ socket and waiting
@@ -110,15 +197,22 @@ class Device:
             device = Device()
             with device.high_frequency_message_sending():
                 device.send_message(...)
+
+        ``send_high_water_mark`` limits the number of messages queued for sending. PUB
+        sockets drop new messages once the limit is reached. Defaults to zmq's default.
         """
         try:
+            self._pub_send_high_water_mark = send_high_water_mark
             self._setup_pub_socket()
             yield
         finally:
             self._teardown_pub_socket()
+            self._pub_send_high_water_mark = None
 
     def _setup_pub_socket(self):
         self._pub_socket = zmq.Context.instance().socket(zmq.PUB)
+        if self._pub_send_high_water_mark is not None:
+            self._pub_socket.setsockopt(zmq.SNDHWM, self._pub_send_high_water_mark)
         self._pub_socket.connect(f"tcp://{self.address}:{self.ipc_pub_port}")
 
     def _teardown_pub_socket(self):
@@ -137,6 +231,20 @@ class Device:
     def request_version(self) -> str:
         return self._send_recv_command("v")
 
+    @ensure_connected
+    def request_pupil_time_reset(self, pupil_time: float = 0.0) -> str:
+        """Sets the current Pupil time to ``pupil_time`` and re-estimates the clock
+        offset
+
+        Invalidates the :py:attr:`discovery_cache` entry since other processes would
+        otherwise reuse the outdated clock offset.
+        """
+        response: str = self._send_recv_command(f"T {pupil_time}")
+        if self.discovery_cache:
+            self.discovery_cache.invalidate(self.address, self.port)
+        self.estimate_client_to_remote_clock_offset()
+        return response
+
     @ensure_connected
     def request_recording_start(self, session_name: str | None = None) -> str:
         cmd = f"R {session_name}" if session_name else "R"
@@ -181,19 +289,14 @@ class Device:
     @ensure_connected
     def send_notification(self, notification: dict) -> str:
         """Sends ``notification`` to Pupil Remote"""
-        if "subject" not in notification:
-            raise ValueError("`notification` requires a subject field")
+        return self.send_message(_notification_with_topic(notification))
 
-        prefix = "notify."
-        topic_key = "topic"
-        if topic_key in notification and not notification[topic_key].startswith(prefix):
-            raise ValueError(
-                "`notification` contains `topic` field but it does not have the "
-                "necessary prefix `notify.`"
-            )
-        if topic_key not in notification:
-            notification[topic_key] = prefix + notification["subject"]
-        return self.send_message(notification)
+    def prepare_notification(self, notification: dict) -> MessageTemplate:
+        """Validates ``notification`` once and returns a reusable message template
+
+        See :py:meth:`.prepare_message` for details.
+        """
+        return MessageTemplate(_notification_with_topic(notification))
 
     @ensure_connected
     def send_annotation(
@@ -205,26 +308,84 @@ class Device:
             {"topic": "annotation", "label": label, "timestamp": timestamp, **kwargs}
         )
 
+    @ensure_connected
+    def send_annotations_in_background(
+        self, max_size: int = 10000, batch_size: int = 100
+    ) -> AnnotationQueue:
+        """Returns a queue that sends annotations without blocking the caller
+
+        See :py:class:`pupil_labs.pupil_core_network_client.AnnotationQueue` for
+        details.
+        """
+        self._announce("annotation_queue")
+        return AnnotationQueue(self, max_size=max_size, batch_size=batch_size)
+
     @ensure_connected
     def send_message(self, payload: dict) -> str:
         if "topic" not in payload:
             raise ValueError("`payload` needs to contain `topic` field")
 
+        extra_frames = payload.pop("__raw_data__", None)
+        if extra_frames is not None and not isinstance(extra_frames, Sequence):
+            raise ValueError("`payload['__raw_data__'] needs to be a sequence`")
+        # IMPORTANT: serialize first! Else if there is an exception
+        # the next message will have an extra prepended frame
+        serialized_payload = self._packer.pack(payload)
+        return self._send_serialized(
+            payload["topic"].encode("utf-8"), serialized_payload, extra_frames
+        )
+
+    def prepare_message(self, static_fields: dict) -> MessageTemplate:
+        """Returns a message template whose ``static_fields`` are serialized only once
+
+        Use it together with :py:meth:`.send_prepared_message` to send many messages
+        that only differ in a few fields, e.g. ``index`` and ``timestamp``.
+
+        Example:
+
+        .. code-block:: python
+
+            device = Device()
+            template = device.prepare_message({"topic": "hmd_streaming.custom", ...})
+            with device.high_frequency_message_sending():
+                for index, image in enumerate(images):
+                    device.send_prepared_message(
+                        template,
+                        raw_data=[image],
+                        index=index,
+                        timestamp=device.current_pupil_time(),
+                    )
+        """
+        return MessageTemplate(static_fields)
+
+    @ensure_connected
+    def send_prepared_message(
+        self,
+        template: MessageTemplate,
+        raw_data: Sequence | None = None,
+        **fields,
+    ) -> str:
+        """Sends a message created from ``template`` and the changing ``fields``
+
+        ``raw_data`` corresponds to the ``__raw_data__`` field of
+        :py:meth:`.send_message`.
+        """
+        serialized_payload = template.serialize(**fields)
+        return self._send_serialized(template.topic_bytes, serialized_payload, raw_data)
+
+    def _send_serialized(
+        self,
+        topic: bytes,
+        serialized_payload: bytes,
+        extra_frames: Sequence | None = None,
+    ) -> str:
         socket, wait_for_response = (
             (self._pub_socket, False) if self._pub_socket else (self._req_socket, True)
         )
-        if "__raw_data__" not in payload:
-            # IMPORTANT: serialize first! Else if there is an exception
-            # the next message will have an extra prepended frame
-            serialized_payload = msgpack.packb(payload, use_bin_type=True)
-            socket.send_string(payload["topic"], flags=zmq.SNDMORE)
+        socket.send(topic, flags=zmq.SNDMORE)
+        if not extra_frames:
             socket.send(serialized_payload)
         else:
-            extra_frames = payload.pop("__raw_data__")
-            if not isinstance(extra_frames, Sequence):
-                raise ValueError("`payload['__raw_data__'] needs to be a sequence`")
-            socket.send_string(payload["topic"], flags=zmq.SNDMORE)
-            serialized_payload = msgpack.packb(payload, use_bin_type=True)
             socket.send(serialized_payload, flags=zmq.SNDMORE)
             for frame in extra_frames[:-1]:
                 socket.send(frame, flags=zmq.SNDMORE, copy=True)
@@ -233,6 +394,34 @@ class Device:
         response: str = self._req_socket.recv_string() if wait_for_response else "OK"
         return response
 
+    @ensure_connected
+    def send_prepared_message_tracked(
+        self,
+        template: MessageTemplate,
+        raw_data: Sequence,
+        **fields,
+    ) -> zmq.MessageTracker:
+        """Like :py:meth:`.send_prepared_message` but sends ``raw_data`` without copying
+
+        Requires :py:meth:`.high_frequency_message_sending`. The returned tracker is
+        done once zmq released the last raw data frame, i.e. the message left the send
+        queue. A tracker that is not done yet indicates send backpressure. The frames
+        must not be modified until then.
+        """
+        if not self._pub_socket:
+            raise RuntimeError(
+                "Tracked sending requires `high_frequency_message_sending()`"
+            )
+        if not raw_data:
+            raise ValueError("`raw_data` needs to contain at least one frame")
+        serialized_payload = template.serialize(**fields)
+        socket = self._pub_socket
+        socket.send(template.topic_bytes, flags=zmq.SNDMORE)
+        socket.send(serialized_payload, flags=zmq.SNDMORE)
+        for frame in raw_data[:-1]:
+            socket.send(frame, flags=zmq.SNDMORE, copy=True)
+        return socket.send(raw_data[-1], copy=False, track=True)
+
     @ensure_connected
     def estimate_client_to_remote_clock_offset(
         self, num_measurements: int = 10
@@ -293,7 +482,9 @@ class Device:
     @ensure_connected
     def subscribe(self, topics: str | Sequence[str]) -> Subscription:
         self._announce(f"subscription.{topics}")
-        return Subscription(self.address, port=self.ipc_sub_port, topics=topics)
+        return Subscription(
+            self.address, port=self._connected_ipc_sub_port, topics=topics
+        )
 
     @ensure_connected
     def subscribe_in_background(
@@ -301,22 +492,102 @@ class Device:
     ) -> Subscription:
         self._announce(f"subscription.{topics}")
         return BackgroundSubscription(
-            self.address, port=self.ipc_sub_port, topics=topics, buffer_size=buffer_size
+            self.address,
+            port=self._connected_ipc_sub_port,
+            topics=topics,
+            buffer_size=buffer_size,
+        )
+
+    @ensure_connected
+    def subscribe_synchronized(
+        self,
+        reference_topic: str,
+        topics: str | Sequence[str],
+        *,
+        tolerance: float = 0.05,
+        max_latency: float = 0.5,
+        buffer_size: int = 1000,
+    ) -> SynchronizedSubscription:
+        """Subscribes to ``reference_topic`` and ``topics`` and pairs each reference
+        message with the closest-in-time message of each topic
+
+        Example:
+
+        .. code-block:: python
+
+            device = Device()
+            with device.subscribe_synchronized("frame.world", "gaze.3d.") as sub:
+                frame, (gaze,) = sub.recv_synchronized_messages()
+        """
+        synchronizer = TimestampSynchronizer(
+            reference_topic,
+            topics,
+            tolerance=tolerance,
+            max_latency=max_latency,
+            buffer_size=buffer_size,
         )
+        subscription = self.subscribe(synchronizer.all_topics)
+        return SynchronizedSubscription(subscription, synchronizer)
+
+    @property
+    def _connected_ipc_sub_port(self) -> int:
+        if self.ipc_sub_port is None:
+            raise NotConnectedError
+        return self.ipc_sub_port
 
     def _announce(self, announcement: str):
         prefix = "pupil_labs.pupil_core_network_client."
         self.send_notification({"subject": prefix + announcement})
 
-    def _update_ipc_backend_ports(self):
-        self.ipc_pub_port = int(self._send_recv_command("PUB_PORT"))
-        self.ipc_sub_port = int(self._send_recv_command("SUB_PORT"))
+    def _request_ipc_backend_ports(self) -> tuple[int, int]:
+        socket: zmq.Socket = zmq.Context.instance().socket(zmq.REQ)
+        try:
+            socket.connect(f"tcp://{self.address}:{self.port}")
+            socket.send_string("PUB_PORT")
+            pub_port = int(socket.recv_string())
+            socket.send_string("SUB_PORT")
+            sub_port = int(socket.recv_string())
+        finally:
+            socket.close()
+        return pub_port, sub_port
+
+    def _reusable_clock_offset(
+        self, cached: DiscoveryResult
+    ) -> ClockOffsetStatistics | None:
+        if (
+            cached.clock_offset_statistics is None
+            or cached.client_clock != _clock_name(self.client_clock)
+            or self.client_clock not in (time.monotonic, time.time)
+        ):
+            return None
+        mean_offset, std_offset, num_measurements = cached.clock_offset_statistics
+        return ClockOffsetStatistics(mean_offset, std_offset, int(num_measurements))
 
     def _send_recv_command(self, cmd: str, type_: type[T] = str) -> T:
         self._req_socket.send_string(cmd)
         return type_(self._req_socket.recv_string())
 
 
+def _clock_name(clock: ClockFunction) -> str:
+    return f"{clock.__module__}.{getattr(clock, '__qualname__', repr(clock))}"
+
+
+def _notification_with_topic(notification: dict) -> dict:
+    if "subject" not in notification:
+        raise ValueError("`notification` requires a subject field")
+
+    prefix = "notify."
+    topic_key = "topic"
+    if topic_key in notification:
+        if not notification[topic_key].startswith(prefix):
+            raise ValueError(
+                "`notification` contains `topic` field but it does not have the "
+                "necessary prefix `notify.`"
+            )
+        return notification
+    return {topic_key: prefix + notification["subject"], **notification}
+
+
 class ClockOffsetStatistics(NamedTuple):
     mean_offset: float
     "Clock offset mean, in seconds"
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "pupil_labs" / "pupil_core_network_client.json"
+
+
+class DiscoveryResult(NamedTuple):
+    ipc_pub_port: int
+    "Port of the IPC backend's PUB socket"
+    ipc_sub_port: int
+    "Port of the IPC backend's SUB socket"
+    clock_offset_statistics: Sequence[float] | None
+    "Mean, standard deviation, and number of clock offset measurements"
+    client_clock: str
+    "Qualified name of the client clock used for the clock offset estimation"
+    created_at: float
+    "Unix time at which the result was discovered"
+
+
+class DiscoveryCache:
+    """File-based cache for discovered Pupil Remote connection details
+
+    Allows short-lived processes to reuse the IPC backend ports and the clock offset
+    estimation of a previous process for ``ttl`` seconds. Cached results are not
+    validated on use. They become outdated if Pupil Capture restarts, which changes
+    its IPC backend ports, or if Pupil time is reset, e.g. via Pupil Remote's ``T``
+    command, which changes the clock offset. :py:class:`Device` invalidates the entry
+    when reconnecting and in :py:meth:`Device.request_pupil_time_reset`. Choose
+    ``ttl`` accordingly if other clients reset Pupil time.
+
+    Example:
+
+    .. code-block:: python
+
+        device = Device(discovery_cache=DiscoveryCache(ttl=60.0))
+    """
+
+    def __init__(self, ttl: float, path: str | os.PathLike | None = None) -> None:
+        if ttl < 0.0:
+            raise ValueError("`ttl` needs to be non-negative")
+        self.ttl = ttl
+        "Time after which cached results expire, in seconds"
+        self.path = Path(path) if path is not None else default_cache_path()
+        "Location of the cache file"
+
+    def load(self, address: str, port: int) -> DiscoveryResult | None:
+        """Returns the cached result for Pupil Remote at ``address:port`` if fresh"""
+        result = _parse_entry(self._read_entries().get(_entry_key(address, port)))
+        if result is None or not self._is_fresh(result):
+            return None
+        return result
+
+    def store(self, address: str, port: int, result: DiscoveryResult):
+        entries = {}
+        for key, entry in self._read_entries().items():
+            cached = _parse_entry(entry)
+            if cached is not None and self._is_fresh(cached):
+                entries[key] = entry
+        entries[_entry_key(address, port)] = result._asdict()
+        self._write_entries(entries)
+
+    def _write_entries(self, entries: dict):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, such that concurrent processes never
+            # read a partially written cache
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, delete=False, suffix=".tmp"
+            ) as file:
+                json.dump(entries, file)
+            os.replace(file.name, self.path)
+        except OSError:
+            logger.warning(
+                f"Could not write discovery cache {self.path}", exc_info=True
+            )
+
+    def invalidate(self, address: str, port: int):
+        """Removes the cached result for Pupil Remote at ``address:port``"""
+        entries = self._read_entries()
+        if entries.pop(_entry_key(address, port), None) is not None:
+            self._write_entries(entries)
+
+    def _is_fresh(self, result: DiscoveryResult) -> bool:
+        return 0.0 <= time.time() - result.created_at <= self.ttl
+
+    def _read_entries(self) -> dict:
+        try:
+            with self.path.open() as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            logger.debug(f"Ignoring unreadable discovery cache {self.path}")
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+
+def _parse_entry(entry) -> DiscoveryResult | None:
+    """Returns ``None`` for malformed entries, e.g. written by other versions"""
+    try:
+        result = DiscoveryResult(**entry)
+    except TypeError:
+        logger.debug(f"Ignoring malformed discovery cache entry: {entry}")
+        return None
+    clock_offset_statistics = result.clock_offset_statistics
+    is_valid = (
+        _is_int(result.ipc_pub_port)
+        and _is_int(result.ipc_sub_port)
+        and isinstance(result.client_clock, str)
+        and _is_number(result.created_at)
+        and (
+            clock_offset_statistics is None
+            or (
+                isinstance(clock_offset_statistics, list)
+                and len(clock_offset_statistics) == 3
+                and all(map(_is_number, clock_offset_statistics[:2]))
+                and _is_int(clock_offset_statistics[2])
+            )
+        )
+    )
+    if not is_valid:
+        logger.debug(f"Ignoring malformed discovery cache entry: {entry}")
+        return None
+    return result
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    return _is_int(value) or isinstance(value, float)
+
+
+def _entry_key(address: str, port: int) -> str:
+    return f"{address}:{port}"
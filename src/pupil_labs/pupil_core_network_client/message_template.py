@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from typing import Any
+
+import msgpack
+
+
+class MessageTemplate:
+    """Pre-serialized message with a static part and per-message fields
+
+    The static fields are serialized once on construction. Each call to
+    :py:meth:`serialize` only packs the changing fields, e.g. ``index`` and
+    ``timestamp``, and prepends the matching msgpack map header. The result is
+    identical to serializing the merged dictionary with ``msgpack.packb``.
+
+    Use :py:meth:`pupil_labs.pupil_core_network_client.Device.prepare_message` to
+    create templates and
+    :py:meth:`pupil_labs.pupil_core_network_client.Device.send_prepared_message` to
+    send them.
+
+    Instances are not thread-safe since they reuse a single ``msgpack.Packer``.
+    """
+
+    def __init__(self, static_fields: dict) -> None:
+        if "topic" not in static_fields:
+            raise ValueError("`static_fields` needs to contain `topic` field")
+        if "__raw_data__" in static_fields:
+            raise ValueError(
+                "`static_fields` must not contain `__raw_data__`; pass raw frames on "
+                "each send instead"
+            )
+        self.static_fields: dict = dict(static_fields)
+        "Fields shared by all messages created from this template"
+        self.topic: str = static_fields["topic"]
+        "Message topic"
+        self.topic_bytes: bytes = self.topic.encode("utf-8")
+        "Cached utf-8 encoded topic frame"
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._static_serialized = b"".join(
+            self._packer.pack(key) + self._packer.pack(value)
+            for key, value in self.static_fields.items()
+        )
+
+    def serialize(self, **fields: Any) -> bytes:
+        """Returns the serialized payload of the static fields merged with ``fields``
+
+        Raises ``ValueError`` if ``fields`` overlaps with the static fields.
+        """
+        pack = self._packer.pack
+        serialized_fields = []
+        for key, value in fields.items():
+            if key in self.static_fields:
+                raise ValueError(f"Field `{key}` is already part of the template")
+            serialized_fields.append(pack(key))
+            serialized_fields.append(pack(value))
+        header = self._packer.pack_map_header(len(self.static_fields) + len(fields))
+        return b"".join((header, self._static_serialized, *serialized_fields))
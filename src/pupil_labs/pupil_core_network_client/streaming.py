@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from typing import Any, Callable, NamedTuple
+
+import zmq
+
+from .device import Device
+from .message_template import MessageTemplate
+
+logger = logging.getLogger(__name__)
+
+FrameFunction = Callable[[], Any]
+
+
+class StreamStatistics(NamedTuple):
+    topic: str
+    "Feed topic"
+    num_sent: int
+    "Number of sent frames"
+    num_skipped: int
+    "Number of frames skipped because the feed fell behind schedule"
+    num_backpressured: int
+    "Number of frames skipped because the previous frame was still queued"
+    num_downscaled: int
+    "Number of frames sent with reduced resolution"
+    fps: float
+    "Achieved frame rate"
+    jitter: float
+    "Standard deviation of the intervals between sent frames, in seconds"
+
+
+class VideoFeed:
+    """Single video stream of a :py:class:`VideoStreamer`
+
+    Use :py:meth:`VideoStreamer.add_feed` to create feeds.
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        get_frame: FrameFunction,
+        frame_rate_hz: float,
+        *,
+        format: str = "bgr",
+        focal_length: float = 1000.0,
+    ) -> None:
+        if frame_rate_hz <= 0.0:
+            raise ValueError("`frame_rate_hz` needs to be positive")
+        self.topic = topic
+        "Topic that the ``HMD_Streaming_Source`` plugin subscribes to"
+        self.get_frame = get_frame
+        "Returns the next image array of shape (height, width[, channels])"
+        self.period = 1.0 / frame_rate_hz
+        "Target interval between frames, in seconds"
+        self.format = format
+        self.focal_length = focal_length
+        "Focal length of the dummy pin-hole camera intrinsics at full resolution"
+        self.start_time = 0.0
+        "Pupil time at which the first frame was due"
+        self.num_slots = 0
+        "Number of frame deadlines that passed, i.e. sent or skipped frames"
+        self.is_downscaled = False
+        "Whether frames are currently sent with reduced resolution"
+
+        self.num_sent = 0
+        self.num_skipped = 0
+        self.num_backpressured = 0
+        self.num_downscaled = 0
+        self._tracker: zmq.MessageTracker | None = None
+        self._templates: dict[tuple[int, int], MessageTemplate] = {}
+        self._first_send_time = 0.0
+        self._last_send_time = 0.0
+        self._interval_mean = 0.0
+        self._interval_m2 = 0.0
+        self._num_late_in_row = 0
+        self._num_on_time_in_row = 0
+
+    @property
+    def next_deadline(self) -> float:
+        """Pupil time at which the next frame is due"""
+        # Multiply instead of accumulating periods to avoid drift
+        return self.start_time + self.num_slots * self.period
+
+    @property
+    def is_backpressured(self) -> bool:
+        """Whether the previously sent frame is still queued for sending"""
+        return self._tracker is not None and not self._tracker.done
+
+    def update_downscaling(
+        self, is_late: bool, downscale_after: int, restore_after: int
+    ):
+        """Switches resolution only after consecutive late or on-time frames
+
+        Pupil Capture resets its detectors on resolution changes, i.e. single late
+        frames due to jitter must not toggle the resolution.
+        """
+        if is_late:
+            self._num_late_in_row += 1
+            self._num_on_time_in_row = 0
+            if self._num_late_in_row >= downscale_after:
+                self.is_downscaled = True
+        else:
+            self._num_on_time_in_row += 1
+            self._num_late_in_row = 0
+            if self._num_on_time_in_row >= restore_after:
+                self.is_downscaled = False
+
+    def reset_schedule(self, start_time: float):
+        self.start_time = start_time
+        self.num_slots = 0
+        self.is_downscaled = False
+        self._num_late_in_row = 0
+        self._num_on_time_in_row = 0
+
+    def template(self, width: int, height: int, scale: float = 1.0) -> MessageTemplate:
+        try:
+            return self._templates[width, height]
+        except KeyError:
+            focal_length = self.focal_length * scale
+            template = MessageTemplate(
+                {
+                    "format": self.format,
+                    "projection_matrix": [  # dummy pin-hole camera intrinsics
+                        [focal_length, 0.0, width / 2.0],
+                        [0.0, focal_length, height / 2.0],
+                        [0.0, 0.0, 1.0],
+                    ],
+                    "topic": self.topic,
+                    "width": width,
+                    "height": height,
+                }
+            )
+            self._templates[width, height] = template
+            return template
+
+    def record_sent(self, timestamp: float, tracker: zmq.MessageTracker):
+        self._tracker = tracker
+        if self.num_sent > 0:
+            # Welford's online algorithm for the interval variance
+            interval = timestamp - self._last_send_time
+            num_intervals = self.num_sent
+            delta = interval - self._interval_mean
+            self._interval_mean += delta / num_intervals
+            self._interval_m2 += delta * (interval - self._interval_mean)
+        else:
+            self._first_send_time = timestamp
+        self._last_send_time = timestamp
+        self.num_sent += 1
+
+    @property
+    def statistics(self) -> StreamStatistics:
+        fps = jitter = 0.0
+        if self.num_sent > 1:
+            elapsed = self._last_send_time - self._first_send_time
+            fps = (self.num_sent - 1) / elapsed if elapsed > 0.0 else math.inf
+        if self.num_sent > 2:
+            jitter = math.sqrt(self._interval_m2 / (self.num_sent - 2))
+        return StreamStatistics(
+            self.topic,
+            self.num_sent,
+            self.num_skipped,
+            self.num_backpressured,
+            self.num_downscaled,
+            fps,
+            jitter,
+        )
+
+
+class VideoStreamer:
+    """Streams multiple video feeds to the ``HMD_Streaming_Source`` plugin
+
+    All feeds, e.g. scene and both eye videos, share a single scheduler that paces
+    frames against :py:meth:`Device.current_pupil_time`. When a feed falls behind,
+    the streamer adapts instead of queueing frames:
+
+    - Frames whose deadline passed by more than one period are skipped.
+    - Frames are skipped while the previous frame of the same feed is still in the
+      PUB socket's send queue (see :py:meth:`Device.send_prepared_message_tracked`).
+    - After ``downscale_after`` consecutive frames that were skipped, backpressured,
+      or late by more than ``downscale_threshold`` periods, frames are sent with their
+      resolution reduced by ``downscale_factor``. Full resolution is restored after
+      ``restore_after`` consecutive frames on time. Pupil Capture resets its
+      detectors on resolution changes, i.e. occasional late frames do not change it.
+
+    Frames are only requested from ``get_frame`` if they are actually sent. They are
+    sent without copying and must not be modified afterwards.
+
+    Example:
+
+    .. code-block:: python
+
+        device = Device()
+        streamer = VideoStreamer(device)
+        streamer.add_feed("hmd_streaming.world", render_scene, frame_rate_hz=30)
+        streamer.add_feed("hmd_streaming.eye0", render_eye0, frame_rate_hz=120)
+        streamer.add_feed("hmd_streaming.eye1", render_eye1, frame_rate_hz=120)
+        for stats in streamer.run(duration=10.0).values():
+            print(stats)
+    """
+
+    def __init__(
+        self,
+        device: Device,
+        *,
+        downscale_factor: int = 2,
+        downscale_threshold: float = 0.5,
+        downscale_after: int = 10,
+        restore_after: int = 60,
+        send_high_water_mark: int = 10,
+    ) -> None:
+        if downscale_factor < 1:
+            raise ValueError("`downscale_factor` needs to be at least 1")
+        if downscale_after < 1 or restore_after < 1:
+            raise ValueError(
+                "`downscale_after` and `restore_after` need to be positive"
+            )
+        self.device = device
+        self.downscale_factor = downscale_factor
+        "Resolution reduction of late frames. Set to 1 to disable downscaling."
+        self.downscale_threshold = downscale_threshold
+        "Lateness, in periods, after which frames count as late"
+        self.downscale_after = downscale_after
+        "Number of consecutive late frames after which frames are downscaled"
+        self.restore_after = restore_after
+        "Number of consecutive frames on time after which full resolution is restored"
+        self.send_high_water_mark = send_high_water_mark
+        "Maximum number of messages queued by the PUB socket"
+        self.feeds: list[VideoFeed] = []
+        self._stop_event = threading.Event()
+
+    def add_feed(
+        self,
+        topic: str,
+        get_frame: FrameFunction,
+        frame_rate_hz: float = 60.0,
+        *,
+        format: str = "bgr",
+        focal_length: float = 1000.0,
+    ) -> VideoFeed:
+        feed = VideoFeed(
+            topic,
+            get_frame,
+            frame_rate_hz,
+            format=format,
+            focal_length=focal_length,
+        )
+        self.feeds.append(feed)
+        return feed
+
+    @property
+    def statistics(self) -> dict[str, StreamStatistics]:
+        return {feed.topic: feed.statistics for feed in self.feeds}
+
+    def run(self, duration: float | None = None) -> dict[str, StreamStatistics]:
+        """Streams all feeds until :py:meth:`stop` is called or ``duration`` passed"""
+        if not self.feeds:
+            raise ValueError("Requires at least one feed")
+        self._stop_event.clear()
+        with self.device.high_frequency_message_sending(
+            send_high_water_mark=self.send_high_water_mark
+        ):
+            start = self.device.current_pupil_time()
+            end = start + duration if duration is not None else math.inf
+            for feed in self.feeds:
+                feed.reset_schedule(start)
+            while not self._stop_event.is_set():
+                feed = min(self.feeds, key=lambda feed: feed.next_deadline)
+                if feed.next_deadline >= end:
+                    break
+                wait = feed.next_deadline - self.device.current_pupil_time()
+                if wait > 0.0 and self._stop_event.wait(wait):
+                    break
+                self._send_due_frame(feed, end)
+        return self.statistics
+
+    def stop(self):
+        """Stops :py:meth:`run`. Can be called from other threads."""
+        self._stop_event.set()
+
+    def _send_due_frame(self, feed: VideoFeed, end: float):
+        now = self.device.current_pupil_time()
+        # Frames due after the requested duration are neither sent nor skipped
+        lateness = min(now, end) - feed.next_deadline
+        is_late = lateness > self.downscale_threshold * feed.period
+        if lateness >= feed.period:
+            num_missed = int(lateness // feed.period)
+            logger.debug(f"{feed.topic}: skipping {num_missed} late frame(s)")
+            feed.num_skipped += num_missed
+            feed.num_slots += num_missed
+            lateness -= num_missed * feed.period
+            if feed.next_deadline >= end:
+                return
+        feed.num_slots += 1
+
+        is_backpressured = feed.is_backpressured
+        if self.downscale_factor > 1:
+            feed.update_downscaling(
+                is_late or is_backpressured, self.downscale_after, self.restore_after
+            )
+        if is_backpressured:
+            feed.num_backpressured += 1
+            return
+
+        frame = feed.get_frame()
+        scale = 1.0
+        if feed.is_downscaled:
+            frame = frame[:: self.downscale_factor, :: self.downscale_factor].copy()
+            scale = 1.0 / self.downscale_factor
+            feed.num_downscaled += 1
+
+        height, width = frame.shape[:2]
+        tracker = self.device.send_prepared_message_tracked(
+            feed.template(width, height, scale),
+            [frame],
+            index=feed.num_sent,
+            timestamp=now,
+        )
+        feed.record_sent(now, tracker)
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import bisect
+import logging
+from typing import NamedTuple, Sequence
+
+from .subscription import Message, Subscription
+
+logger = logging.getLogger(__name__)
+
+
+class SynchronizedMessages(NamedTuple):
+    reference: Message
+    "Message of the reference topic"
+    matches: tuple[Message | None, ...]
+    "Closest message per matched topic, ``None`` if none was within tolerance"
+
+    @property
+    def timestamp(self) -> float:
+        return self.reference.payload["timestamp"]
+
+
+class TimestampSynchronizer:
+    """Aligns messages of multiple topics by their ``timestamp`` field
+
+    Each message of the reference topic is paired with the message of each matched
+    topic that is closest in time. A reference message is emitted as soon as every
+    matched topic has received a message that is at least as new as the reference
+    message, or once it is older than ``max_latency`` seconds relative to the newest
+    timestamp seen so far. Matches further apart than ``tolerance`` seconds are
+    reported as ``None``.
+
+    Messages older than the newest timestamp by more than ``max_latency`` are dropped
+    as stragglers since they can not be matched anymore. If ``reset_threshold`` such
+    messages arrive in a row, Pupil time is assumed to have jumped backwards, e.g.
+    after a reset via Pupil Remote's ``T`` command. In that case, buffered messages
+    are flushed and synchronization continues with the new timestamps.
+
+    Messages are assigned to the first topic that their topic starts with, i.e. the
+    same prefix semantics as zmq subscriptions. Buffers are kept sorted by timestamp
+    and hold at most ``buffer_size`` messages per topic. Older messages are dropped
+    if a topic stalls.
+
+    Example:
+
+    .. code-block:: python
+
+        sync = TimestampSynchronizer("frame.world", ["gaze.3d.0.", "gaze.3d.1."])
+        for message in messages:
+            for frame, (gaze_0, gaze_1) in sync.add(message):
+                ...
+    """
+
+    def __init__(
+        self,
+        reference_topic: str,
+        topics: str | Sequence[str],
+        *,
+        tolerance: float = 0.05,
+        max_latency: float = 0.5,
+        buffer_size: int = 1000,
+        reset_threshold: int = 3,
+    ) -> None:
+        if tolerance < 0.0:
+            raise ValueError("`tolerance` needs to be non-negative")
+        if max_latency < 0.0:
+            raise ValueError("`max_latency` needs to be non-negative")
+        if buffer_size < 1:
+            raise ValueError("`buffer_size` needs to be at least 1")
+        if reset_threshold < 1:
+            raise ValueError("`reset_threshold` needs to be at least 1")
+        self.reference_topic = reference_topic
+        self.topics: tuple[str, ...] = (
+            (topics,) if isinstance(topics, str) else tuple(topics)
+        )
+        self.tolerance = tolerance
+        "Maximum time difference between matched messages, in seconds"
+        self.max_latency = max_latency
+        "Maximum time to wait for matching messages, in seconds"
+        self.buffer_size = buffer_size
+        "Maximum number of buffered messages per topic"
+        self.reset_threshold = reset_threshold
+        "Number of consecutive outdated messages that indicate a Pupil time reset"
+        self.num_dropped = 0
+        "Number of messages dropped due to full buffers or arriving too late"
+
+        num_streams = 1 + len(self.topics)
+        self._timestamps: list[list[float]] = [[] for _ in range(num_streams)]
+        self._messages: list[list[Message]] = [[] for _ in range(num_streams)]
+        self._newest_timestamp = float("-inf")
+        self._outdated: list[tuple[int, float, Message]] = []
+
+    @property
+    def all_topics(self) -> tuple[str, ...]:
+        return (self.reference_topic,) + self.topics
+
+    def add(self, message: Message) -> list[SynchronizedMessages]:
+        """Buffers ``message`` and returns all reference messages ready for emission"""
+        stream = self._stream_index(message.topic)
+        if stream is None:
+            logger.debug(f"Ignoring message with unexpected topic {message.topic}")
+            return []
+        try:
+            timestamp = float(message.payload["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            logger.debug(f"Ignoring message without timestamp: {message.topic}")
+            return []
+
+        if timestamp < self._newest_timestamp - self.max_latency:
+            self._outdated.append((stream, timestamp, message))
+            if len(self._outdated) < self.reset_threshold:
+                return []
+            # Pupil time jumped backwards. Buffered messages can not be matched with
+            # newer ones anymore.
+            logger.debug(f"Timestamps jumped backwards to {timestamp}; resetting")
+            outdated = self._outdated
+            emitted = self.flush()
+            for stream, timestamp, message in outdated:
+                emitted.extend(self._insert(stream, timestamp, message))
+            return emitted
+
+        if self._outdated:
+            logger.debug(f"Dropping {len(self._outdated)} outdated message(s)")
+            self.num_dropped += len(self._outdated)
+            self._outdated = []
+        return self._insert(stream, timestamp, message)
+
+    def _insert(
+        self, stream: int, timestamp: float, message: Message
+    ) -> list[SynchronizedMessages]:
+        timestamps = self._timestamps[stream]
+        messages = self._messages[stream]
+        # Messages usually arrive in order; insort keeps the buffer sorted otherwise
+        position = bisect.bisect_right(timestamps, timestamp)
+        timestamps.insert(position, timestamp)
+        messages.insert(position, message)
+        if len(timestamps) > self.buffer_size:
+            del timestamps[0]
+            del messages[0]
+            self.num_dropped += 1
+        self._newest_timestamp = max(self._newest_timestamp, timestamp)
+        return self._emit(force=False)
+
+    def flush(self) -> list[SynchronizedMessages]:
+        """Emits all buffered reference messages with the currently best matches"""
+        emitted = self._emit(force=True)
+        for timestamps, messages in zip(self._timestamps, self._messages):
+            timestamps.clear()
+            messages.clear()
+        self._newest_timestamp = float("-inf")
+        self._outdated = []
+        return emitted
+
+    def _stream_index(self, topic: str) -> int | None:
+        for index, prefix in enumerate(self.all_topics):
+            if topic.startswith(prefix):
+                return index
+        return None
+
+    def _emit(self, force: bool) -> list[SynchronizedMessages]:
+        reference_timestamps = self._timestamps[0]
+        reference_messages = self._messages[0]
+        emitted = []
+        while reference_timestamps:
+            reference_ts = reference_timestamps[0]
+            is_expired = self._newest_timestamp - reference_ts > self.max_latency
+            if not (force or is_expired or self._all_streams_caught_up(reference_ts)):
+                break
+            matches = tuple(
+                self._closest_match(stream, reference_ts)
+                for stream in range(1, len(self._timestamps))
+            )
+            emitted.append(SynchronizedMessages(reference_messages[0], matches))
+            del reference_timestamps[0]
+            del reference_messages[0]
+            # Later reference messages are not older, i.e. anything before the
+            # tolerance window can not be matched anymore
+            self._discard_older_than(reference_ts - self.tolerance)
+
+        if not reference_timestamps:
+            # Bound memory during reference gaps; late reference messages are
+            # emitted immediately and only need the most recent history
+            self._discard_older_than(
+                self._newest_timestamp - self.max_latency - self.tolerance
+            )
+        return emitted
+
+    def _all_streams_caught_up(self, reference_ts: float) -> bool:
+        # Each topic arrives in order, i.e. once a topic reached the reference
+        # timestamp no closer message will follow
+        return all(
+            timestamps and timestamps[-1] >= reference_ts
+            for timestamps in self._timestamps[1:]
+        )
+
+    def _closest_match(self, stream: int, reference_ts: float) -> Message | None:
+        timestamps = self._timestamps[stream]
+        position = bisect.bisect_left(timestamps, reference_ts)
+        candidates = [
+            index for index in (position - 1, position) if 0 <= index < len(timestamps)
+        ]
+        if not candidates:
+            return None
+        closest = min(
+            candidates, key=lambda index: abs(timestamps[index] - reference_ts)
+        )
+        if abs(timestamps[closest] - reference_ts) > self.tolerance:
+            return None
+        return self._messages[stream][closest]
+
+    def _discard_older_than(self, timestamp: float):
+        for timestamps, messages in zip(self._timestamps[1:], self._messages[1:]):
+            num_outdated = bisect.bisect_left(timestamps, timestamp)
+            if num_outdated:
+                del timestamps[:num_outdated]
+                del messages[:num_outdated]
+
+
+class SynchronizedSubscription:
+    """Subscribes to multiple topics and receives timestamp-aligned messages
+
+    See :py:class:`TimestampSynchronizer` for the matching semantics. Use
+    :py:meth:`pupil_labs.pupil_core_network_client.Device.subscribe_synchronized` as
+    entry point.
+
+    Example:
+
+    .. code-block:: python
+
+        device = Device()
+        with device.subscribe_synchronized("pupil.0.", "pupil.1.") as sub:
+            while True:
+                synced = sub.recv_synchronized_messages()
+                pupil_0, (pupil_1,) = synced
+    """
+
+    def __init__(
+        self, subscription: Subscription, synchronizer: TimestampSynchronizer
+    ) -> None:
+        self.subscription = subscription
+        "Underlying subscription to all synchronized topics"
+        self.synchronizer = synchronizer
+        self._ready: list[SynchronizedMessages] = []
+
+    @property
+    def is_connected(self):
+        return self.subscription.is_connected
+
+    def disconnect(self):
+        self.subscription.disconnect()
+
+    def recv_synchronized_messages(
+        self, timeout_ms: int | None = None
+    ) -> SynchronizedMessages | None:
+        """Receives messages until the next aligned tuple is ready
+
+        Returns ``None`` if no message was received within ``timeout_ms``.
+        """
+        while not self._ready:
+            message = self.subscription.recv_new_message(timeout_ms=timeout_ms)
+            if message is None:
+                return None
+            self._ready.extend(self.synchronizer.add(message))
+        return self._ready.pop(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.disconnect()
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import msgpack
+import pytest
+import zmq
+
+from pupil_labs.pupil_core_network_client import (
+    AnnotationQueue,
+    ClockOffsetStatistics,
+)
+
+
+class _FakeDevice:
+    address = "127.0.0.1"
+
+    def __init__(self, ipc_pub_port: int) -> None:
+        self.ipc_pub_port = ipc_pub_port
+        self.client_clock = time.monotonic
+        self.clock_offset_statistics = ClockOffsetStatistics(100.0, 0.001, 10)
+
+
+def _receive_until_idle(socket: zmq.Socket, payloads: list):
+    # Polling continuously, like Pupil Capture's IPC backbone, lets subscriptions
+    # reach the connecting socket
+    while socket.poll(500):
+        topic, payload = socket.recv_multipart()
+        assert topic == b"annotation"
+        payloads.append(msgpack.unpackb(payload))
+
+
+def test_sends_queued_annotations_on_close() -> None:
+    sub = zmq.Context.instance().socket(zmq.SUB)
+    sub.subscribe("")
+    port = sub.bind_to_random_port("tcp://127.0.0.1")
+    payloads: list = []
+    receiver = threading.Thread(target=_receive_until_idle, args=(sub, payloads))
+    receiver.start()
+    try:
+        queue = AnnotationQueue(_FakeDevice(port), batch_size=7)
+        with queue:
+            before = time.monotonic() + 100.0
+            for trial in range(50):
+                assert queue.send_annotation("stimulus", trial=trial)
+        assert not queue.send_annotation("after close")
+
+        receiver.join()
+        assert [payload["trial"] for payload in payloads] == list(range(50))
+        assert payloads[0]["timestamp"] >= before
+        stats = queue.statistics
+        assert stats.num_sent == 50
+        assert stats.num_dropped == 1
+    finally:
+        receiver.join()
+        sub.close()
+
+
+def test_drops_annotations_when_full() -> None:
+    device = _FakeDevice(ipc_pub_port=0)
+    queue = AnnotationQueue(device, max_size=3, connect_timeout=0.0)
+    # Keep the worker busy so that the queue fills up
+    with queue._sent_condition:
+        accepted = [queue.send_annotation("x") for _ in range(10)]
+        assert not all(accepted)
+    queue.close()
+    stats = queue.statistics
+    assert stats.num_enqueued == sum(accepted)
+    assert stats.num_dropped == 10 - sum(accepted)
+    assert stats.num_sent + stats.num_failed == stats.num_enqueued
+
+
+def test_unserializable_annotation_does_not_stop_queue() -> None:
+    queue = AnnotationQueue(_FakeDevice(ipc_pub_port=0), connect_timeout=0.0)
+    assert queue.send_annotation("big", value=2**70)
+    assert queue.send_annotation("unsupported", value=object())
+    assert queue.send_annotation("valid")
+    assert queue.flush(timeout=2.0)
+    assert queue.is_running
+    queue.close(timeout=2.0)
+    assert not queue._worker_thread.is_alive()
+    stats = queue.statistics
+    assert stats.num_failed == 2
+    assert stats.num_sent == 1
+
+
+def test_connection_errors_are_raised() -> None:
+    with pytest.raises(zmq.ZMQError):
+        AnnotationQueue(_FakeDevice(ipc_pub_port="invalid"), connect_timeout=0.0)
@@ -1,6 +1,27 @@
+import subprocess
+import sys
+
 import pupil_labs.pupil_core_network_client as this_project
 
 
 def test_package_metadata() -> None:
     assert hasattr(this_project, "__version__")
     assert this_project.__version__ is not None
+
+
+def test_import_is_lazy() -> None:
+    code = (
+        "import sys, pupil_labs.pupil_core_network_client as pcnc\n"
+        "assert 'zmq' not in sys.modules and 'msgpack' not in sys.modules\n"
+        "pcnc.Device\n"
+        "assert 'zmq' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_lazy_device_does_not_connect() -> None:
+    device = this_project.Device(port=1, lazy_connect=True)
+    assert device.is_connection_pending
+    assert not device.is_connected
+    assert device.ipc_pub_port is None
+    assert device.ipc_sub_port is None
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import msgpack
+import pytest
+import zmq
+
+from pupil_labs.pupil_core_network_client import Device, DiscoveryCache
+
+PUB_PORT = 1234
+SUB_PORT = 1235
+
+
+class _FakePupilRemote:
+    """Replies to Pupil Remote commands on a random port"""
+
+    def __init__(self, replies=None) -> None:
+        self.replies = {
+            "t": lambda: str(time.monotonic() + 100.0),
+            "v": lambda: "3.5.0",
+            "PUB_PORT": lambda: str(PUB_PORT),
+            "SUB_PORT": lambda: str(SUB_PORT),
+            **(replies or {}),
+        }
+        self.commands = []
+        self.notifications = []
+        self._socket = zmq.Context.instance().socket(zmq.REP)
+        self.port = self._socket.bind_to_random_port("tcp://127.0.0.1")
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop_event.is_set():
+            if not self._socket.poll(10):
+                continue
+            frames = self._socket.recv_multipart()
+            if len(frames) > 1:
+                self.notifications.append(msgpack.unpackb(frames[1]))
+                self._socket.send_string("Notification received.")
+                continue
+            command = frames[0].decode()
+            self.commands.append(command)
+            reply = self.replies.get(command.split(" ")[0], lambda: "OK")
+            self._socket.send_string(reply())
+
+    def close(self):
+        self._stop_event.set()
+        self._thread.join()
+        self._socket.close(linger=0)
+
+
+@pytest.fixture
+def remote():
+    remote = _FakePupilRemote()
+    yield remote
+    remote.close()
+
+
+def test_connect_requests_ports_and_clock_offset(remote) -> None:
+    device = Device(port=remote.port)
+    assert (device.ipc_pub_port, device.ipc_sub_port) == (PUB_PORT, SUB_PORT)
+    assert device.clock_offset_statistics.num_measurements == 10
+    assert remote.commands.count("PUB_PORT") == 1
+    assert remote.commands.count("SUB_PORT") == 1
+    assert remote.commands.count("t") == 10
+    device.disconnect()
+
+
+def test_failed_port_discovery_raises_connection_error() -> None:
+    remote = _FakePupilRemote(replies={"PUB_PORT": lambda: "unknown command"})
+    try:
+        with pytest.raises(ConnectionError):
+            Device(port=remote.port)
+    finally:
+        remote.close()
+
+
+def test_lazy_device_connects_on_first_use(remote) -> None:
+    device = Device(port=remote.port, lazy_connect=True)
+    assert remote.commands == []
+    assert device.request_version() == "3.5.0"
+    assert not device.is_connection_pending
+    assert device.ipc_sub_port == SUB_PORT
+    device.disconnect()
+
+
+def test_discovery_cache_skips_discovery(remote, tmp_path) -> None:
+    cache = DiscoveryCache(ttl=60.0, path=tmp_path / "discovery.json")
+    first = Device(port=remote.port, discovery_cache=cache)
+    first.disconnect()
+    cached = cache.load("127.0.0.1", remote.port)
+    assert cached is not None
+    assert cached.ipc_pub_port == PUB_PORT
+
+    remote.commands.clear()
+    second = Device(port=remote.port, discovery_cache=cache)
+    assert remote.commands == []
+    assert second.ipc_sub_port == SUB_PORT
+    assert second.clock_offset_statistics == first.clock_offset_statistics
+
+    second.connect(use_discovery_cache=False)
+    assert "PUB_PORT" in remote.commands
+    second.disconnect()
+
+
+def test_pupil_time_reset_invalidates_discovery_cache(remote, tmp_path) -> None:
+    cache = DiscoveryCache(ttl=60.0, path=tmp_path / "discovery.json")
+    device = Device(port=remote.port, discovery_cache=cache)
+    device.request_pupil_time_reset(0.0)
+    assert "T 0.0" in remote.commands
+    assert cache.load("127.0.0.1", remote.port) is None
+    device.disconnect()
+
+
+def test_send_notification_does_not_modify_notification(remote) -> None:
+    device = Device(port=remote.port)
+    notification = {"subject": "custom"}
+    device.send_notification(notification)
+    assert notification == {"subject": "custom"}
+    assert remote.notifications[-1] == {"topic": "notify.custom", "subject": "custom"}
+    device.disconnect()
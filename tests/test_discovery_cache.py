@@ -0,0 +1,53 @@
+import json
+import time
+
+from pupil_labs.pupil_core_network_client import DiscoveryCache, DiscoveryResult
+
+
+def _result(created_at: float) -> DiscoveryResult:
+    return DiscoveryResult(1234, 1235, [100.0, 0.001, 10], "time.monotonic", created_at)
+
+
+def test_load_returns_stored_result(tmp_path) -> None:
+    cache = DiscoveryCache(ttl=60.0, path=tmp_path / "discovery.json")
+    assert cache.load("127.0.0.1", 50020) is None
+    result = _result(time.time())
+    cache.store("127.0.0.1", 50020, result)
+    assert cache.load("127.0.0.1", 50020) == result
+    assert cache.load("127.0.0.1", 50021) is None
+
+
+def test_expired_results_are_ignored(tmp_path) -> None:
+    cache = DiscoveryCache(ttl=60.0, path=tmp_path / "discovery.json")
+    cache.store("127.0.0.1", 50020, _result(time.time() - 120.0))
+    assert cache.load("127.0.0.1", 50020) is None
+
+
+def test_unreadable_cache_is_ignored(tmp_path) -> None:
+    path = tmp_path / "discovery.json"
+    path.write_text("not json")
+    cache = DiscoveryCache(ttl=60.0, path=path)
+    assert cache.load("127.0.0.1", 50020) is None
+    cache.store("127.0.0.1", 50020, _result(time.time()))
+    assert cache.load("127.0.0.1", 50020) is not None
+
+
+def test_malformed_entries_are_cache_misses(tmp_path) -> None:
+    path = tmp_path / "discovery.json"
+    valid = _result(time.time())._asdict()
+    path.write_text(
+        json.dumps(
+            {
+                "127.0.0.1:1": {**valid, "created_at": "yesterday"},
+                "127.0.0.1:2": {**valid, "clock_offset_statistics": [100.0]},
+                "127.0.0.1:3": {**valid, "ipc_pub_port": "1234"},
+                "127.0.0.1:4": "not an entry",
+            }
+        )
+    )
+    cache = DiscoveryCache(ttl=60.0, path=path)
+    for port in range(1, 5):
+        assert cache.load("127.0.0.1", port) is None
+    cache.store("127.0.0.1", 5, _result(time.time()))
+    assert cache.load("127.0.0.1", 5) is not None
+    assert list(json.loads(path.read_text())) == ["127.0.0.1:5"]
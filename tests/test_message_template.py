@@ -0,0 +1,26 @@
+import msgpack
+import pytest
+
+from pupil_labs.pupil_core_network_client import MessageTemplate
+
+
+def test_serialize_matches_packb() -> None:
+    static_fields = {"topic": "hmd_streaming.custom", "format": "bgr", "width": 600}
+    template = MessageTemplate(static_fields)
+    serialized = template.serialize(index=3, timestamp=1.5)
+    expected = {**static_fields, "index": 3, "timestamp": 1.5}
+    assert msgpack.unpackb(serialized) == expected
+    assert template.topic_bytes == b"hmd_streaming.custom"
+
+
+def test_serialize_without_fields() -> None:
+    template = MessageTemplate({"topic": "annotation"})
+    assert template.serialize() == msgpack.packb({"topic": "annotation"})
+
+
+def test_rejects_invalid_fields() -> None:
+    with pytest.raises(ValueError):
+        MessageTemplate({"format": "bgr"})
+    template = MessageTemplate({"topic": "annotation"})
+    with pytest.raises(ValueError):
+        template.serialize(topic="other")
@@ -0,0 +1,99 @@
+import contextlib
+
+from pupil_labs.pupil_core_network_client import VideoStreamer
+
+
+class _Frame:
+    def __init__(self, shape=(4, 6, 3)) -> None:
+        self.shape = shape
+
+    def __getitem__(self, index):
+        height, width = (
+            len(range(*axis.indices(size))) for axis, size in zip(index, self.shape)
+        )
+        return _Frame((height, width) + self.shape[2:])
+
+    def copy(self):
+        return self
+
+
+class _Tracker:
+    done = True
+
+
+class _FakeDevice:
+    """Sends instantly while advancing a fake clock by `send_duration` per frame"""
+
+    def __init__(self, send_duration: float, slow_sends=None) -> None:
+        self.time = 0.0
+        self.send_duration = send_duration
+        self.slow_sends = slow_sends or {}
+        "Send duration by send index, overriding `send_duration`"
+        self.sent = []
+
+    def current_pupil_time(self) -> float:
+        return self.time
+
+    @contextlib.contextmanager
+    def high_frequency_message_sending(self, send_high_water_mark=None):
+        yield
+
+    def send_prepared_message_tracked(self, template, raw_data, **fields):
+        self.time += self.slow_sends.get(len(self.sent), self.send_duration)
+        self.sent.append((template.topic, fields))
+        return _Tracker()
+
+
+def _run(send_duration: float, duration: float = 1.0):
+    device = _FakeDevice(send_duration)
+    streamer = VideoStreamer(device, downscale_factor=1)
+    streamer._stop_event.wait = _advance_clock(device)
+    streamer.add_feed("hmd_streaming.world", _Frame, frame_rate_hz=10)
+    streamer.add_feed("hmd_streaming.eye0", _Frame, frame_rate_hz=20)
+    return device, streamer.run(duration=duration)
+
+
+def _advance_clock(device):
+    def wait(timeout):
+        device.time += timeout
+        return False
+
+    return wait
+
+
+def test_paces_feeds_from_one_scheduler() -> None:
+    device, stats = _run(send_duration=0.0)
+    assert stats["hmd_streaming.world"].num_sent == 10
+    assert stats["hmd_streaming.eye0"].num_sent == 20
+    assert stats["hmd_streaming.eye0"].fps == 20.0
+    assert stats["hmd_streaming.eye0"].jitter < 1e-9
+    assert [fields["index"] for _, fields in device.sent[:3]] == [0, 0, 1]
+
+
+def test_skips_frames_when_behind() -> None:
+    _, stats = _run(send_duration=0.1)
+    eye = stats["hmd_streaming.eye0"]
+    assert eye.num_skipped > 0
+    assert eye.num_sent + eye.num_skipped == 20
+
+
+def _run_downscaling(device):
+    streamer = VideoStreamer(device, downscale_factor=2, downscale_after=3)
+    streamer._stop_event.wait = _advance_clock(device)
+    streamer.add_feed("hmd_streaming.eye0", _Frame, frame_rate_hz=20)
+    return streamer.run(duration=1.0)["hmd_streaming.eye0"]
+
+
+def test_single_late_frame_is_not_downscaled() -> None:
+    # The fifth frame is sent 0.6 periods late
+    device = _FakeDevice(send_duration=0.0, slow_sends={3: 0.08})
+    stats = _run_downscaling(device)
+    assert stats.num_skipped == 0
+    assert stats.num_downscaled == 0
+
+
+def test_downscales_when_persistently_late() -> None:
+    device = _FakeDevice(send_duration=0.08)
+    stats = _run_downscaling(device)
+    assert stats.num_downscaled > 0
+    assert stats.num_downscaled < stats.num_sent
@@ -0,0 +1,91 @@
+from pupil_labs.pupil_core_network_client import Message, TimestampSynchronizer
+
+
+def _msg(topic: str, timestamp: float) -> Message:
+    return Message(topic, {"topic": topic, "timestamp": timestamp})
+
+
+def test_matches_closest_message_per_topic() -> None:
+    sync = TimestampSynchronizer("frame.world", ["gaze."], tolerance=0.01)
+    assert sync.add(_msg("gaze.3d.0.", 0.995)) == []
+    assert sync.add(_msg("frame.world", 1.0)) == []
+    emitted = sync.add(_msg("gaze.3d.0.", 1.002))
+    assert len(emitted) == 1
+    _, (match,) = emitted[0]
+    assert match is not None
+    assert match.payload["timestamp"] == 1.002
+
+
+def test_emits_once_all_topics_caught_up() -> None:
+    sync = TimestampSynchronizer("pupil.0.", ["pupil.1."], tolerance=0.01)
+    sync.add(_msg("pupil.0.3d", 1.0))
+    sync.add(_msg("pupil.1.3d", 0.996))
+    emitted = sync.add(_msg("pupil.1.3d", 1.003))
+    assert len(emitted) == 1
+    reference, (match,) = emitted[0]
+    assert reference.payload["timestamp"] == 1.0
+    assert match is not None
+    assert match.payload["timestamp"] == 1.003
+
+
+def test_unmatched_topic_times_out_as_none() -> None:
+    sync = TimestampSynchronizer(
+        "frame.world", ["gaze.", "pupil."], tolerance=0.01, max_latency=0.1
+    )
+    sync.add(_msg("frame.world", 1.0))
+    sync.add(_msg("gaze.3d.", 1.0))
+    assert sync.add(_msg("gaze.3d.", 1.05)) == []
+    emitted = sync.add(_msg("gaze.3d.", 1.2))
+    assert len(emitted) == 1
+    _, (gaze, pupil) = emitted[0]
+    assert gaze is not None and gaze.payload["timestamp"] == 1.0
+    assert pupil is None
+
+
+def test_buffers_are_bounded_during_gaps() -> None:
+    sync = TimestampSynchronizer(
+        "frame.world", ["gaze."], max_latency=0.1, buffer_size=50
+    )
+    for index in range(1000):
+        sync.add(_msg("gaze.3d.", index * 0.01))
+    assert all(len(buffer) <= 50 for buffer in sync._timestamps)
+
+
+def test_flush_emits_pending_references() -> None:
+    sync = TimestampSynchronizer("frame.world", ["gaze."])
+    sync.add(_msg("frame.world", 1.0))
+    emitted = sync.flush()
+    assert [synced.timestamp for synced in emitted] == [1.0]
+    assert emitted[0].matches == (None,)
+
+
+def test_recovers_from_pupil_time_reset() -> None:
+    sync = TimestampSynchronizer(
+        "frame.world", ["gaze."], tolerance=0.01, max_latency=0.1
+    )
+    for index in range(10):
+        sync.add(_msg("frame.world", 1000.0 + index * 0.03))
+        sync.add(_msg("gaze.3d.", 1000.0 + index * 0.03))
+    after_reset = []
+    for index in range(30):
+        after_reset += sync.add(_msg("frame.world", index * 0.03))
+        after_reset += sync.add(_msg("gaze.3d.", index * 0.03))
+    after_reset = [synced for synced in after_reset if synced.timestamp < 1000.0]
+    assert len(after_reset) == 30
+    assert all(match is not None for _, (match,) in after_reset)
+
+
+def test_drops_single_outdated_message() -> None:
+    sync = TimestampSynchronizer(
+        "frame.world", ["gaze."], tolerance=0.01, max_latency=0.5
+    )
+    emitted = []
+    for index in range(30):
+        timestamp = 10.0 + index / 30
+        emitted += sync.add(_msg("frame.world", timestamp))
+        if index == 15:
+            emitted += sync.add(_msg("gaze.3d.", timestamp - 0.6))
+        emitted += sync.add(_msg("gaze.3d.", timestamp))
+    assert len(emitted) == 30
+    assert all(match is not None for _, (match,) in emitted)
+    assert sync.num_dropped == 1